@@ -0,0 +1,204 @@
+import asyncio
+import time
+
+import httpx
+import requests
+
+import googlemaps
+from googlemaps import client as _client
+from googlemaps import geocoding
+
+
+# requests_kwargs that from_client can reproduce on the httpx client.
+_TRANSFERABLE_KWARGS = frozenset(["headers", "timeout", "verify"])
+
+
+class AsyncClient(_client._BaseClient):
+    """A client whose requests are coroutines, so many lookups can be in
+    flight at once over a shared HTTP/2 connection. Only geocode and
+    reverse_geocode are available.
+    """
+
+    __slots__ = ("_headers", "_qps_lock")
+
+    def __init__(self, key=None, client_id=None, client_secret=None,
+                 timeout=None, connect_timeout=None, read_timeout=None,
+                 retry_timeout=60, queries_per_second=50, channel=None,
+                 retry_over_query_limit=True, session=None):
+
+        super(AsyncClient, self).__init__(
+            key=key, client_id=client_id, client_secret=client_secret,
+            retry_timeout=retry_timeout,
+            queries_per_second=queries_per_second, channel=channel,
+            retry_over_query_limit=retry_over_query_limit)
+
+        if timeout and (connect_timeout or read_timeout):
+            raise ValueError("Specify either timeout, or connect_timeout "
+                             "and read_timeout")
+
+        # Sessions passed in by the caller are theirs to configure and close,
+        # so our headers are sent with each request instead.
+        headers = {"User-Agent": _client._USER_AGENT}
+        self._owns_session = session is None
+        self._headers = None
+        if session is None:
+            session = _new_session(timeout, connect_timeout, read_timeout,
+                                   queries_per_second)
+            session.headers.update(headers)
+        else:
+            self._headers = headers
+        self.session = session
+
+        # Created on first use so it belongs to the running event loop.
+        self._qps_lock = None
+
+    @classmethod
+    def from_client(cls, client):
+        """Returns an AsyncClient with the same credentials, limits and
+        headers as the given Client.
+
+        Raises ValueError if the client has requests options (such as
+        proxies) that can't be carried over to httpx.
+        """
+        unsupported = set(client.requests_kwargs) - _TRANSFERABLE_KWARGS
+        if unsupported:
+            raise ValueError("AsyncClient can't use the requests_kwargs %s." %
+                             ", ".join(sorted(unsupported)))
+        if getattr(client.session, "proxies", None):
+            raise ValueError("AsyncClient can't use the session's proxies.")
+
+        if "headers" in client.requests_kwargs:
+            headers = client.requests_kwargs["headers"]
+        else:
+            # Skip requests' own defaults; they include hop-by-hop headers
+            # like Connection that HTTP/2 forbids.
+            defaults = requests.utils.default_headers()
+            headers = {k: v for k, v in client.session.headers.items()
+                       if defaults.get(k) != v}
+
+        timeout, connect_timeout, read_timeout = client.timeout, None, None
+        if isinstance(timeout, tuple):
+            timeout = None
+            connect_timeout, read_timeout = client.timeout
+
+        async_client = cls(key=client.key, client_id=client.client_id,
+                           client_secret=client.client_secret,
+                           timeout=timeout, connect_timeout=connect_timeout,
+                           read_timeout=read_timeout,
+                           retry_timeout=client.retry_timeout,
+                           queries_per_second=client.queries_per_second,
+                           channel=client.channel,
+                           retry_over_query_limit=client.retry_over_query_limit)
+        async_client.session.headers.update(headers)
+        # Share the client's rate limit window, so requests from both count
+        # against the same queries_per_second.
+        async_client.sent_times = client.sent_times
+        return async_client
+
+    async def aclose(self):
+        """Closes the underlying httpx client, releasing its connections.
+        Sessions passed in by the caller are left open.
+        """
+        if self._owns_session:
+            await self.session.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def _request(self, url, params, first_request_time=None,
+                       retry_counter=0, base_url=_client._DEFAULT_BASE_URL,
+                       accepts_clientid=True, extract_body=None,
+                       requests_kwargs=None, post_json=None,
+                       extra_params=None):
+
+        if not first_request_time:
+            first_request_time = time.monotonic()
+
+        authed_url = self._generate_auth_url(url, params, accepts_clientid,
+                                             extra_params)
+
+        # Timeouts and TLS verification are configured on the httpx client.
+        request_kwargs = {}
+        if self._headers is not None:
+            request_kwargs["headers"] = self._headers
+        request_kwargs.update(requests_kwargs or {})
+        requests_method = self.session.get
+        if post_json is not None:
+            requests_method = self.session.post
+            request_kwargs["json"] = post_json
+
+        if self._qps_lock is None:
+            self._qps_lock = asyncio.Lock()
+
+        while True:
+            if time.monotonic() - first_request_time > self.retry_timeout:
+                raise googlemaps.exceptions.Timeout()
+
+            if retry_counter > 0:
+                await asyncio.sleep(_client._retry_delay(retry_counter))
+
+            # Reserve a send slot under the lock so concurrent requests
+            # can't all claim the same one.
+            async with self._qps_lock:
+                qps_delay = self._qps_delay()
+                if qps_delay > 0:
+                    await asyncio.sleep(qps_delay)
+                self.sent_times.append(time.monotonic())
+
+            try:
+                response = await requests_method(base_url + authed_url,
+                                                 **request_kwargs)
+            except httpx.TimeoutException:
+                raise googlemaps.exceptions.Timeout()
+            except Exception as e:
+                raise googlemaps.exceptions.TransportError(e)
+
+            if response.status_code in _client._RETRIABLE_STATUSES:
+                retry_counter += 1
+                continue
+
+            try:
+                if extract_body:
+                    return extract_body(response)
+                return self._get_body(response)
+            except googlemaps.exceptions._RetriableRequest as e:
+                if isinstance(e, googlemaps.exceptions._OverQueryLimit) and not self.retry_over_query_limit:
+                    raise
+
+                retry_counter += 1
+
+    async def geocode(self, address=None, components=None, bounds=None,
+                      region=None, language=None, extra_params=None):
+        params = geocoding._geocode_params(address, components, bounds,
+                                           region, language)
+        body = await self._request(geocoding._GEOCODE_PATH, params,
+                                   extra_params=extra_params)
+        return body.get("results", [])
+
+    async def reverse_geocode(self, latlng, result_type=None,
+                              location_type=None, language=None,
+                              extra_params=None):
+        params = geocoding._reverse_geocode_params(latlng, result_type,
+                                                   location_type, language)
+        body = await self._request(geocoding._GEOCODE_PATH, params,
+                                   extra_params=extra_params)
+        return body.get("results", [])
+
+
+def _new_session(timeout, connect_timeout, read_timeout, queries_per_second):
+    if connect_timeout and read_timeout:
+        timeout = httpx.Timeout(None, connect=connect_timeout,
+                                read=read_timeout)
+    else:
+        timeout = httpx.Timeout(timeout)
+
+    limits = httpx.Limits(max_connections=queries_per_second)
+    try:
+        # HTTP/2 multiplexes concurrent requests over one TLS connection.
+        return httpx.AsyncClient(http2=True, limits=limits, timeout=timeout)
+    except ImportError:
+        # The h2 package (httpx[http2]) isn't installed; use HTTP/1.1.
+        return httpx.AsyncClient(limits=limits, timeout=timeout)
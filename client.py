@@ -1,10 +1,10 @@
 import base64
 import collections
-from datetime import datetime
-from datetime import timedelta
 import functools
 import hashlib
 import hmac
+import importlib
+import inspect
 import re
 import requests
 import random
@@ -17,21 +17,33 @@ try: # Python 3
 except ImportError: # Python 2
     from urllib import urlencode
 
+try: # Optional, faster JSON decoding.
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
 
 _USER_AGENT = "GoogleGeoApiClientPython/%s" % googlemaps.__version__
 _DEFAULT_BASE_URL = "https://maps.googleapis.com"
 
-_RETRIABLE_STATUSES = set([500, 503, 504])
+_RETRIABLE_STATUSES = frozenset([500, 503, 504])
 
-class Client(object):
-    
+_CHANNEL_RE = re.compile(r"\A[a-zA-Z0-9._-]*\Z")
+
+class _BaseClient(object):
+    """Credentials, URL signing, rate limiting and response handling shared
+    by Client and googlemaps.async_client.AsyncClient. Subclasses set up
+    the session and implement _request.
+    """
+
+    __slots__ = ("__weakref__", "session", "_owns_session", "key",
+                 "client_id", "client_secret", "_hmac_base", "channel",
+                 "retry_timeout", "queries_per_second",
+                 "retry_over_query_limit", "sent_times")
 
     def __init__(self, key=None, client_id=None, client_secret=None,
-                 timeout=None, connect_timeout=None, read_timeout=None,
-                 retry_timeout=60, requests_kwargs=None,
-                 queries_per_second=50, channel=None,
+                 retry_timeout=60, queries_per_second=50, channel=None,
                  retry_over_query_limit=True):
-        
         if not key and not (client_secret and client_id):
             raise ValueError("Must provide API key or enterprise credentials "
                              "when creating client.")
@@ -43,13 +55,145 @@ class Client(object):
             if not client_id:
                 raise ValueError("The channel argument must be used with a "
                                  "client ID")
-            if not re.match("^[a-zA-Z0-9._-]*$", channel):
+            if not _CHANNEL_RE.match(channel):
                 raise ValueError("The channel argument must be an ASCII "
                     "alphanumeric string. The period (.), underscore (_)"
                     "and hyphen (-) characters are allowed.")
 
-        self.session = requests.Session()
         self.key = key
+        self.client_id = client_id
+        self.client_secret = client_secret
+        # The signing key never changes, so decode it and run the HMAC key
+        # schedule once. Each signature starts from a copy of this object.
+        self._hmac_base = None
+        if client_secret:
+            signing_key = base64.urlsafe_b64decode(
+                client_secret.encode('ascii', 'strict'))
+            self._hmac_base = hmac.new(signing_key, digestmod=hashlib.sha1)
+        self.channel = channel
+        # Seconds, compared against time.monotonic() deltas.
+        self.retry_timeout = retry_timeout
+        self.queries_per_second = queries_per_second
+        self.retry_over_query_limit = retry_over_query_limit
+        # Monotonic send times of requests within the last second. Unbounded
+        # so expired entries can be popped from the left as the window moves.
+        self.sent_times = collections.deque()
+
+    def _qps_delay(self):
+        """Returns the seconds to wait before the next send to stay within
+        queries_per_second.
+        """
+        # Drop send times that have left the one second window. If it's
+        # still full, wait until the oldest one expires.
+        now = time.monotonic()
+        while self.sent_times and self.sent_times[0] <= now - 1.0:
+            self.sent_times.popleft()
+        if len(self.sent_times) < self.queries_per_second:
+            return 0
+        return self.sent_times.popleft() + 1.0 - now
+
+    def _get_body(self, response):
+        status_code = response.status_code
+        if status_code != 200:
+            raise googlemaps.exceptions.HTTPError(status_code)
+
+        body = _json_loads(response.content)
+
+        api_status = body["status"]
+        if api_status == "OK" or api_status == "ZERO_RESULTS":
+            return body
+
+        if api_status == "OVER_QUERY_LIMIT":
+            raise googlemaps.exceptions._OverQueryLimit(
+                api_status, body.get("error_message"))
+
+        raise googlemaps.exceptions.ApiError(api_status,
+                                             body.get("error_message"))
+
+    def _generate_auth_url(self, path, params, accepts_clientid,
+                           extra_params=None):
+        """Returns the path and query string portion of the request URL, first
+        adding any necessary parameters.
+        :param path: The path portion of the URL.
+        :type path: string
+        :param params: URL parameters.
+        :type params: dict or list of key/value tuples
+        :param extra_params: Additional parameters passed by the caller.
+        :type extra_params: dict
+        :rtype: string
+        """
+        extra_params = extra_params or {}
+
+        if accepts_clientid and self.client_id and self.client_secret:
+            # Deterministic ordering through sorting by key, so the same
+            # request always produces the same signed URL.
+            if type(params) is dict:
+                params = sorted(dict(extra_params, **params).items())
+            else:
+                params = sorted(extra_params.items()) + params[:] # Take a copy.
+
+            if self.channel:
+                params.append(("channel", self.channel))
+            params.append(("client", self.client_id))
+
+            path = "?".join([path, urlencode_params(params)])
+            sig = self._sign_hmac(path)
+            return path + "&signature=" + sig
+
+        if self.key:
+            # Unsigned URLs don't depend on parameter order, so skip the sort.
+            if type(params) is dict:
+                params = list(dict(extra_params, **params).items())
+            else:
+                params = list(extra_params.items()) + params # Take a copy.
+
+            params.append(("key", self.key))
+            return path + "?" + urlencode_params(params)
+
+        raise ValueError("Must provide API key for this API. It does not accept "
+                         "enterprise credentials.")
+
+    def _sign_hmac(self, payload):
+        """Signs payload with a copy of the client's keyed HMAC."""
+        sig = self._hmac_base.copy()
+        sig.update(payload.encode('ascii'))
+        out = base64.urlsafe_b64encode(sig.digest())
+        return out.decode('utf-8')
+
+
+class Client(_BaseClient):
+    
+
+    __slots__ = ("timeout", "requests_kwargs", "cache", "cache_ttl",
+                 "geocode_cache_size", "cache_latlng_digits",
+                 "_geocode_cache")
+
+    def __init__(self, key=None, client_id=None, client_secret=None,
+                 timeout=None, connect_timeout=None, read_timeout=None,
+                 retry_timeout=60, requests_kwargs=None,
+                 queries_per_second=50, channel=None,
+                 retry_over_query_limit=True, cache=None, cache_ttl=86400,
+                 geocode_cache_size=0, cache_latlng_digits=None,
+                 session=None):
+        
+        super(Client, self).__init__(
+            key=key, client_id=client_id, client_secret=client_secret,
+            retry_timeout=retry_timeout,
+            queries_per_second=queries_per_second, channel=channel,
+            retry_over_query_limit=retry_over_query_limit)
+
+        # Sessions passed in by the caller are theirs to configure and close.
+        self._owns_session = session is None
+        if session is None:
+            # Size the connection pool to the QPS limit so bursts reuse
+            # kept-alive connections rather than opening new TLS sessions.
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=queries_per_second,
+                pool_maxsize=queries_per_second,
+                pool_block=False)
+            session.mount("https://", adapter)
+        self.session = session
 
         if timeout and (connect_timeout or read_timeout):
             raise ValueError("Specify either timeout, or connect_timeout "
@@ -65,51 +209,69 @@ class Client(object):
         else:
             self.timeout = timeout
 
-        self.client_id = client_id
-        self.client_secret = client_secret
-        self.channel = channel
-        self.retry_timeout = timedelta(seconds=retry_timeout)
         self.requests_kwargs = requests_kwargs or {}
         headers = self.requests_kwargs.pop('headers', {})
-        headers.update({"User-Agent": _USER_AGENT})        
+        headers.update({"User-Agent": _USER_AGENT})
+        if self._owns_session:
+            # Client-level headers live on our own session, which requests
+            # merges into every call.
+            self.session.headers.update(headers)
+        else:
+            self.requests_kwargs["headers"] = headers
         self.requests_kwargs.update({
-            "headers": headers,
             "timeout": self.timeout,
             "verify": True,  # NOTE(cbro): verify SSL certs.
         })
 
-        self.queries_per_second = queries_per_second
-        self.retry_over_query_limit = retry_over_query_limit
-        self.sent_times = collections.deque("", queries_per_second)
+        # Geocode results are only cached when asked for, since a cached
+        # result can be up to cache_ttl seconds (None: until evicted) stale.
+        # cache is a shared store (e.g. a Redis client) exposing get(key) and
+        # set(key, value, ttl_seconds); without one, results are kept in a
+        # per-client LRU of geocode_cache_size entries. Setting
+        # cache_latlng_digits rounds reverse_geocode coordinates in the cache
+        # key (3 digits is ~100m), so nearby points share an entry at the
+        # cost of possibly returning a neighbouring address.
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        self.geocode_cache_size = geocode_cache_size
+        self.cache_latlng_digits = cache_latlng_digits
+        self._geocode_cache = None
+        if cache is None and geocode_cache_size > 0:
+            self._geocode_cache = collections.OrderedDict()
+    def close(self):
+        """Closes the underlying session, releasing pooled connections.
+        Sessions passed in by the caller are left open.
+        """
+        if self._owns_session:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def _request(self, url, params, first_request_time=None, retry_counter=0,
              base_url=_DEFAULT_BASE_URL, accepts_clientid=True,
-             extract_body=None, requests_kwargs=None, post_json=None):
+             extract_body=None, requests_kwargs=None, post_json=None,
+             extra_params=None):
         
     
 
         if not first_request_time:
-            first_request_time = datetime.now()
-
-        elapsed = datetime.now() - first_request_time
-        if elapsed > self.retry_timeout:
-            raise googlemaps.exceptions.Timeout()
-
-        if retry_counter > 0:
-            # 0.5 * (1.5 ^ i) is an increased sleep time of 1.5x per iteration,
-            # starting at 0.5s when retry_counter=0. The first retry will occur
-            # at 1, so subtract that first.
-            delay_seconds = 0.5 * 1.5 ** (retry_counter - 1)
-
-            # Jitter this value by 50% and pause.
-            time.sleep(delay_seconds * (random.random() + 0.5))
+            first_request_time = time.monotonic()
 
-        authed_url = self._generate_auth_url(url, params, accepts_clientid)
+        # The URL is signed once; retries resend the same request.
+        authed_url = self._generate_auth_url(url, params, accepts_clientid,
+                                             extra_params)
 
         # Default to the client-level self.requests_kwargs, with method-level
-        # requests_kwargs arg overriding.
-        requests_kwargs = requests_kwargs or {}
-        final_requests_kwargs = dict(self.requests_kwargs, **requests_kwargs)
+        # requests_kwargs arg overriding. Only copy when something is added.
+        if requests_kwargs or post_json is not None:
+            final_requests_kwargs = dict(self.requests_kwargs,
+                                         **(requests_kwargs or {}))
+        else:
+            final_requests_kwargs = self.requests_kwargs
 
         # Determine GET/POST.
         requests_method = self.session.get
@@ -117,173 +279,149 @@ class Client(object):
             requests_method = self.session.post
             final_requests_kwargs["json"] = post_json
 
-        try:
-            response = requests_method(base_url + authed_url,
-                                       **final_requests_kwargs)
-        except requests.exceptions.Timeout:
-            raise googlemaps.exceptions.Timeout()
-        except Exception as e:
-            raise googlemaps.exceptions.TransportError(e)
-
-        if response.status_code in _RETRIABLE_STATUSES:
-            # Retry request.
-            return self._request(url, params, first_request_time,
-                                 retry_counter + 1, base_url, accepts_clientid,
-                                 extract_body, requests_kwargs, post_json)
-
-        # Check if the time of the nth previous query (where n is
-        # queries_per_second) is under a second ago - if so, sleep for
-        # the difference.
-        if self.sent_times and len(self.sent_times) == self.queries_per_second:
-            elapsed_since_earliest = time.time() - self.sent_times[0]
-            if elapsed_since_earliest < 1:
-                time.sleep(1 - elapsed_since_earliest)
-
-        try:
-            if extract_body:
-                result = extract_body(response)
-            else:
-                result = self._get_body(response)
-            self.sent_times.append(time.time())
-            return result
-        except googlemaps.exceptions._RetriableRequest as e:
-            if isinstance(e, googlemaps.exceptions._OverQueryLimit) and not self.retry_over_query_limit:
-                raise
-
-            # Retry request.
-            return self._request(url, params, first_request_time,
-                                 retry_counter + 1, base_url, accepts_clientid,
-                                 extract_body, requests_kwargs, post_json)
+        while True:
+            if time.monotonic() - first_request_time > self.retry_timeout:
+                raise googlemaps.exceptions.Timeout()
+
+            if retry_counter > 0:
+                time.sleep(_retry_delay(retry_counter))
+
+            qps_delay = self._qps_delay()
+            if qps_delay > 0:
+                time.sleep(qps_delay)
+
+            try:
+                response = requests_method(base_url + authed_url,
+                                           **final_requests_kwargs)
+            except requests.exceptions.Timeout:
+                raise googlemaps.exceptions.Timeout()
+            except Exception as e:
+                raise googlemaps.exceptions.TransportError(e)
+            finally:
+                self.sent_times.append(time.monotonic())
+
+            if response.status_code in _RETRIABLE_STATUSES:
+                # Retry request.
+                retry_counter += 1
+                continue
+
+            try:
+                if extract_body:
+                    result = extract_body(response)
+                else:
+                    result = self._get_body(response)
+                return result
+            except googlemaps.exceptions._RetriableRequest as e:
+                if isinstance(e, googlemaps.exceptions._OverQueryLimit) and not self.retry_over_query_limit:
+                    raise
+
+                # Retry request.
+                retry_counter += 1
 
     def _get(self, *args, **kwargs):  # Backwards compatibility.
         return self._request(*args, **kwargs)
 
-    def _get_body(self, response):
-        if response.status_code != 200:
-            raise googlemaps.exceptions.HTTPError(response.status_code)
 
-        body = response.json()
+# API methods start out as stubs on Client that import their module and
+# bind the real method on first call, so callers only pay for the modules
+# they use.
+_API_METHODS = {
+    "directions": ("googlemaps.directions", "directions"),
+    "distance_matrix": ("googlemaps.distance_matrix", "distance_matrix"),
+    "elevation": ("googlemaps.elevation", "elevation"),
+    "elevation_along_path": ("googlemaps.elevation", "elevation_along_path"),
+    "geocode": ("googlemaps.geocoding", "geocode"),
+    "geocode_many": ("googlemaps.geocoding", "geocode_many"),
+    "reverse_geocode": ("googlemaps.geocoding", "reverse_geocode"),
+    "geolocate": ("googlemaps.geolocation", "geolocate"),
+    "timezone": ("googlemaps.timezone", "timezone"),
+    "snap_to_roads": ("googlemaps.roads", "snap_to_roads"),
+    "nearest_roads": ("googlemaps.roads", "nearest_roads"),
+    "speed_limits": ("googlemaps.roads", "speed_limits"),
+    "snapped_speed_limits": ("googlemaps.roads", "snapped_speed_limits"),
+    "find_place": ("googlemaps.places", "find_place"),
+    "places": ("googlemaps.places", "places"),
+    "places_nearby": ("googlemaps.places", "places_nearby"),
+    "places_radar": ("googlemaps.places", "places_radar"),
+    "place": ("googlemaps.places", "place"),
+    "places_photo": ("googlemaps.places", "places_photo"),
+    "places_autocomplete": ("googlemaps.places", "places_autocomplete"),
+    "places_autocomplete_query": ("googlemaps.places", "places_autocomplete_query"),
+}
+
+
+def _retry_delay(retry_counter):
+    # "Full jitter" backoff: a random time between zero and an exponential
+    # ceiling (0.5s, 1s, 2s, ... capped at 32s). Spreading retries over the
+    # whole window keeps clients that failed together from retrying in
+    # lockstep. The first retry will occur at 1, so subtract that first.
+    return random.uniform(0, min(32.0, 0.5 * 2 ** (retry_counter - 1)))
 
-        api_status = body["status"]
-        if api_status == "OK" or api_status == "ZERO_RESULTS":
-            return body
 
-        if api_status == "OVER_QUERY_LIMIT":
-            raise googlemaps.exceptions._OverQueryLimit(
-                api_status, body.get("error_message"))
+def make_api_method(func):
+    
+    accepts_extra_params = "extra_params" in inspect.signature(func).parameters
 
-        raise googlemaps.exceptions.ApiError(api_status,
-                                             body.get("error_message"))
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        extra_params = kwargs.pop("extra_params", None)
+        if extra_params is None:
+            return func(*args, **kwargs)
 
-    def _generate_auth_url(self, path, params, accepts_clientid):
-        """Returns the path and query string portion of the request URL, first
-        adding any necessary parameters.
-        :param path: The path portion of the URL.
-        :type path: string
-        :param params: URL parameters.
-        :type params: dict or list of key/value tuples
-        :rtype: string
-        """
-        # Deterministic ordering through sorting by key.
-        # Useful for tests, and in the future, any caching.
-        extra_params = getattr(self, "_extra_params", None) or {}
-        if type(params) is dict:
-            params = sorted(dict(extra_params, **params).items())
-        else:
-            params = sorted(extra_params.items()) + params[:] # Take a copy.
+        if accepts_extra_params:
+            return func(*args, extra_params=extra_params, **kwargs)
 
-        if accepts_clientid and self.client_id and self.client_secret:
-            if self.channel:
-                params.append(("channel", self.channel))
-            params.append(("client", self.client_id))
+        # The function doesn't thread extra_params to Client._request
+        # itself, so hand it a view of the client that adds them.
+        client = _ExtraParamsClient(args[0], extra_params)
+        return func(client, *args[1:], **kwargs)
+    return wrapper
 
-            path = "?".join([path, urlencode_params(params)])
-            sig = sign_hmac(self.client_secret, path)
-            return path + "&signature=" + sig
 
-        if self.key:
-            params.append(("key", self.key))
-            return path + "?" + urlencode_params(params)
+class _ExtraParamsClient(object):
+    """Wraps a Client so every _request call carries extra_params, without
+    storing them on the shared client.
+    """
 
-        raise ValueError("Must provide API key for this API. It does not accept "
-                         "enterprise credentials.")
+    __slots__ = ("_client", "_extra_params")
 
+    def __init__(self, client, extra_params):
+        self._client = client
+        self._extra_params = extra_params
 
-from googlemaps.directions import directions
-from googlemaps.distance_matrix import distance_matrix
-from googlemaps.elevation import elevation
-from googlemaps.elevation import elevation_along_path
-from googlemaps.geocoding import geocode
-from googlemaps.geocoding import reverse_geocode
-from googlemaps.geolocation import geolocate
-from googlemaps.timezone import timezone
-from googlemaps.roads import snap_to_roads
-from googlemaps.roads import nearest_roads
-from googlemaps.roads import speed_limits
-from googlemaps.roads import snapped_speed_limits
-from googlemaps.places import find_place
-from googlemaps.places import places
-from googlemaps.places import places_nearby
-from googlemaps.places import places_radar
-from googlemaps.places import place
-from googlemaps.places import places_photo
-from googlemaps.places import places_autocomplete
-from googlemaps.places import places_autocomplete_query
+    def __getattr__(self, name):
+        return getattr(self._client, name)
 
+    def _request(self, *args, **kwargs):
+        kwargs.setdefault("extra_params", self._extra_params)
+        return self._client._request(*args, **kwargs)
 
-def make_api_method(func):
-    
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        args[0]._extra_params = kwargs.pop("extra_params", None)
-        result = func(*args, **kwargs)
-        try:
-            del args[0]._extra_params
-        except AttributeError:
-            pass
-        return result
-    return wrapper
 
+def _lazy_api_method(name, module_name, func_name):
+    def method(self, *args, **kwargs):
+        func = getattr(importlib.import_module(module_name), func_name)
+        api_method = make_api_method(func)
+        setattr(Client, name, api_method)
+        return api_method(self, *args, **kwargs)
 
-Client.directions = make_api_method(directions)
-Client.distance_matrix = make_api_method(distance_matrix)
-Client.elevation = make_api_method(elevation)
-Client.elevation_along_path = make_api_method(elevation_along_path)
-Client.geocode = make_api_method(geocode)
-Client.reverse_geocode = make_api_method(reverse_geocode)
-Client.geolocate = make_api_method(geolocate)
-Client.timezone = make_api_method(timezone)
-Client.snap_to_roads = make_api_method(snap_to_roads)
-Client.nearest_roads = make_api_method(nearest_roads)
-Client.speed_limits = make_api_method(speed_limits)
-Client.snapped_speed_limits = make_api_method(snapped_speed_limits)
-Client.find_place = make_api_method(find_place)
-Client.places = make_api_method(places)
-Client.places_nearby = make_api_method(places_nearby)
-Client.places_radar = make_api_method(places_radar)
-Client.place = make_api_method(place)
-Client.places_photo = make_api_method(places_photo)
-Client.places_autocomplete = make_api_method(places_autocomplete)
-Client.places_autocomplete_query = make_api_method(places_autocomplete_query)
+    method.__name__ = name
+    method.__doc__ = "See %s.%s." % (module_name, func_name)
+    return method
+
+
+for _name, (_module_name, _func_name) in _API_METHODS.items():
+    setattr(Client, _name, _lazy_api_method(_name, _module_name, _func_name))
 
 
 def sign_hmac(secret, payload):
     
-    payload = payload.encode('ascii', 'strict')
+    payload = payload.encode('ascii')
     secret = secret.encode('ascii', 'strict')
     sig = hmac.new(base64.urlsafe_b64decode(secret), payload, hashlib.sha1)
     out = base64.urlsafe_b64encode(sig.digest())
     return out.decode('utf-8')
 
 
-def urlencode_params(params):
-    
-    
-    params = [(key, normalize_for_urlencode(val)) for key, val in params]
-    
-    return requests.utils.unquote_unreserved(urlencode(params))
-
-
 try:
     unicode
     
@@ -298,8 +436,22 @@ try:
 
         return normalize_for_urlencode(str(value))
 
+    def urlencode_params(params):
+        
+        
+        params = [(key, normalize_for_urlencode(val)) for key, val in params]
+        
+        return requests.utils.unquote_unreserved(urlencode(params))
+
 except NameError:
     def normalize_for_urlencode(value):
        
         
         return value
+
+    def urlencode_params(params):
+        # urlencode handles str/int/float values natively, and its
+        # quote_plus leaves the RFC 3986 unreserved characters unescaped
+        # (~ is listed for Python < 3.7), so no unquote_unreserved
+        # post-pass is needed.
+        return urlencode(params, safe="~")
@@ -5,7 +5,8 @@ def directions(client, origin, destination,
                mode=None, waypoints=None, alternatives=False, avoid=None,
                language=None, units=None, region=None, departure_time=None,
                arrival_time=None, optimize_waypoints=False, transit_mode=None,
-               transit_routing_preference=None, traffic_model=None):
+               transit_routing_preference=None, traffic_model=None,
+               extra_params=None):
     
 
     params = {
@@ -60,4 +61,5 @@ def directions(client, origin, destination,
     if traffic_model:
         params["traffic_model"] = traffic_model
 
-    return client._request("/maps/api/directions/json", params).get("routes", [])
+    return client._request("/maps/api/directions/json", params,
+                           extra_params=extra_params).get("routes", [])
@@ -1,48 +1,199 @@
-from googlemaps import convert
-
-
-def geocode(client, address=None, components=None, bounds=None, region=None,
-            language=None):
-    
+import asyncio
+import copy
+import json
+import logging
+import time
 
-    params = {}
+from googlemaps import convert
 
-    if address:
-        params["address"] = address
 
-    if components:
-        params["components"] = convert.components(components)
+logger = logging.getLogger(__name__)
 
-    if bounds:
-        params["bounds"] = convert.bounds(bounds)
+_GEOCODE_PATH = "/maps/api/geocode/json"
 
-    if region:
-        params["region"] = region
 
-    if language:
-        params["language"] = language
+def geocode(client, address=None, components=None, bounds=None, region=None,
+            language=None, extra_params=None):
+    
 
-    return client._request("/maps/api/geocode/json", params).get("results", [])
+    params = _geocode_params(address, components, bounds, region, language)
+    return _geocode_results(client, params, extra_params)
 
 
 def reverse_geocode(client, latlng, result_type=None, location_type=None,
-                    language=None):
+                    language=None, extra_params=None):
    
 
+    params = _reverse_geocode_params(latlng, result_type, location_type,
+                                     language)
+    return _geocode_results(client, params, extra_params)
+
+
+def geocode_many(client, addresses, components=None, bounds=None, region=None,
+                 language=None, extra_params=None):
+    """Geocodes many addresses concurrently, as fast as the client's
+    queries_per_second allows. Requires httpx.
+
+    Runs its own event loop, so it can't be called from async code; use
+    googlemaps.async_client.AsyncClient there instead.
+
+    :param addresses: The addresses to geocode.
+    :type addresses: list of strings
+
+    :rtype: list of result lists, in the same order as addresses
+    """
+    from googlemaps.async_client import AsyncClient
+
+    # Identical addresses are only looked up once, and cached ones not at
+    # all. As in _geocode_results, extra_params bypass the cache.
+    results = {}
+    misses = []
+    for address in dict.fromkeys(addresses):
+        params = _geocode_params(address, components, bounds, region,
+                                 language)
+        cache_key = _cache_key(client, params)
+        cached = None
+        if not extra_params:
+            cached = _cache_get(client, cache_key)
+        if cached is None:
+            misses.append((address, params, cache_key))
+        else:
+            results[address] = cached
+
+    async def fetch():
+        async with AsyncClient.from_client(client) as async_client:
+            return await asyncio.gather(*[
+                async_client._request(_GEOCODE_PATH, params,
+                                      extra_params=extra_params)
+                for _, params, _ in misses])
+
+    if misses:
+        for (address, _, cache_key), body in zip(misses, asyncio.run(fetch())):
+            results[address] = body.get("results", [])
+            if not extra_params:
+                _cache_set(client, cache_key, results[address])
+
+    return [copy.deepcopy(results[address]) for address in addresses]
+
+
+def _geocode_params(address, components, bounds, region, language):
+    return {k: v for k, v in (
+        ("address", address),
+        ("components", convert.components(components) if components else None),
+        ("bounds", convert.bounds(bounds) if bounds else None),
+        ("region", region),
+        ("language", language),
+    ) if v}
+
+
+def _reverse_geocode_params(latlng, result_type, location_type, language):
     # Check if latlng param is a place_id string.
     #  place_id strings do not contain commas; latlng strings do.
-    if convert.is_string(latlng) and ',' not in latlng:
-        params = {"place_id": latlng}
+    if isinstance(latlng, str) and ',' not in latlng:
+        location = ("place_id", latlng)
     else:
-        params = {"latlng": convert.latlng(latlng)}
-
-    if result_type:
-        params["result_type"] = convert.join_list("|", result_type)
-
-    if location_type:
-        params["location_type"] = convert.join_list("|", location_type)
-
-    if language:
-        params["language"] = language
-
-    return client._request("/maps/api/geocode/json", params).get("results", [])
+        location = ("latlng", convert.latlng(latlng))
+
+    return {k: v for k, v in (
+        location,
+        ("result_type",
+         convert.join_list("|", result_type) if result_type else None),
+        ("location_type",
+         convert.join_list("|", location_type) if location_type else None),
+        ("language", language),
+    ) if v}
+
+
+def _round_latlng(latlng, digits):
+    """Rounds a "lat,lng" string to the given number of decimals so nearby
+    lookups share a cache entry. Returns it unchanged if it can't be parsed.
+    """
+    try:
+        lat, lng = latlng.split(",")
+        return "%.*f,%.*f" % (digits, float(lat), digits, float(lng))
+    except ValueError:
+        return latlng
+
+
+def _geocode_results(client, params, extra_params=None):
+    # Requests carrying extra_params may differ from what the cache key
+    # describes, so they always go to the network.
+    if extra_params:
+        return _request_results(client, params, extra_params)
+
+    cache_key = _cache_key(client, params)
+    results = _cache_get(client, cache_key)
+    if results is None:
+        results = _request_results(client, params)
+        _cache_set(client, cache_key, results)
+    return results
+
+
+def _cache_key(client, params):
+    # Only the key is rounded; requests are sent with the caller's
+    # full-precision coordinates.
+    if "latlng" in params and client.cache_latlng_digits is not None:
+        params = dict(params, latlng=_round_latlng(
+            params["latlng"], client.cache_latlng_digits))
+    return "googlemaps:geocode:" + json.dumps(sorted(params.items()))
+
+
+def _cache_get(client, cache_key):
+    """Returns cached results for cache_key, or None on a miss."""
+    if client.cache is not None:
+        try:
+            cached = client.cache.get(cache_key)
+            return None if cached is None else json.loads(cached)
+        except Exception as e:
+            logger.warning("Geocode cache get failed: %s", e)
+            return None
+
+    lru = client._geocode_cache
+    entry = lru.get(cache_key) if lru is not None else None
+    if entry is None:
+        return None
+
+    expires, results = entry
+    if expires is not None and expires < time.monotonic():
+        lru.pop(cache_key, None)
+        return None
+
+    try:
+        lru.move_to_end(cache_key)
+    except KeyError: # Evicted by another thread.
+        pass
+    # Callers get a copy so mutating results can't poison the cache.
+    return copy.deepcopy(results)
+
+
+def _cache_set(client, cache_key, results):
+    # Empty (ZERO_RESULTS) responses aren't cached, so a lookup that
+    # starts resolving later isn't stuck on the miss.
+    if not results:
+        return
+
+    if client.cache is not None:
+        try:
+            client.cache.set(cache_key, json.dumps(results), client.cache_ttl)
+        except Exception as e:
+            logger.warning("Geocode cache set failed: %s", e)
+        return
+
+    lru = client._geocode_cache
+    if lru is None:
+        return
+
+    expires = None
+    if client.cache_ttl is not None:
+        expires = time.monotonic() + client.cache_ttl
+    lru[cache_key] = (expires, copy.deepcopy(results))
+    try:
+        while len(lru) > client.geocode_cache_size:
+            lru.popitem(last=False)
+    except KeyError: # Emptied by another thread.
+        pass
+
+
+def _request_results(client, params, extra_params=None):
+    return client._request(_GEOCODE_PATH, params,
+                           extra_params=extra_params).get("results", [])
@@ -23,7 +23,8 @@ def _geolocation_extract(response):
 
 def geolocate(client, home_mobile_country_code=None,
               home_mobile_network_code=None, radio_type=None, carrier=None,
-              consider_ip=None, cell_towers=None, wifi_access_points=None):
+              consider_ip=None, cell_towers=None, wifi_access_points=None,
+              extra_params=None):
     
 
     params = {}
@@ -45,4 +46,5 @@ def geolocate(client, home_mobile_country_code=None,
     return client._request("/geolocation/v1/geolocate", {},  # No GET params
                            base_url=_GEOLOCATION_BASE_URL,
                            extract_body=_geolocation_extract,
-                           post_json=params)
+                           post_json=params,
+                           extra_params=extra_params)